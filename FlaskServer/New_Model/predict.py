@@ -1,22 +1,29 @@
-
+import os
+import glob
 import logging
 from transformers import ViTImageProcessor, ViTForImageClassification
 from PIL import Image
+import numpy as np
 import torch
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load model and processor globally to avoid reloading on every request
-try:
-    processor = ViTImageProcessor.from_pretrained('google/vit-base-patch16-224')
-    model = ViTForImageClassification.from_pretrained('google/vit-base-patch16-224')
-    logger.info("ViT model loaded successfully.")
-except Exception as e:
-    logger.error(f"Failed to load ViT model: {e}")
-    model = None
-    processor = None
+# Which classifier the Vision Agent uses:
+# - "imagenet":  generic google/vit-base-patch16-224, ImageNet labels mapped through DISASTER_MAPPING
+# - "finetuned": local 3-class earthquake/flood/wildfire ViT checkpoint (MYKVASIRV2MODEL layout),
+#                loaded fully offline. Falls back to "imagenet" if no checkpoint weights are found.
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "imagenet")
+# Checkpoint directory (the one holding config.json + weights). Defaults to the newest
+# MYKVASIRV2MODEL/*/model directory that actually contains weights.
+FINETUNED_MODEL_DIR = os.getenv("FINETUNED_MODEL_DIR")
+# Fine-tuned backend only: below this top-class probability the frame is "Normal"
+DISASTER_THRESHOLD = float(os.getenv("DISASTER_THRESHOLD", "0.7"))
+
+IMAGENET_MODEL = 'google/vit-base-patch16-224'
+CHECKPOINT_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'MYKVASIRV2MODEL')
+WEIGHT_FILES = ('model.safetensors', 'pytorch_model.bin')
 
 # Mapping ImageNet classes to Disaster Categories
 # Keys are indices or label substrings (will be checked against predicted label text)
@@ -26,58 +33,184 @@ DISASTER_MAPPING = {
     "Earthquake": ["wreck", "cliff", "rubble", "ruins"]  # Note: 'ruins' isn't a standard class but 'wreck' is (900)
 }
 
-def predict_path(image_path):
+
+class ImageNetProxyBackend:
     """
-    Predicts the class of an image using ViT and maps it to disaster categories.
+    Generic ImageNet ViT. A frame is a disaster if any of its top-5 labels is a proxy
+    for one in DISASTER_MAPPING.
     """
-    if model is None or processor is None:
-        return "Model Load Error"
+    name = "imagenet"
 
-    try:
-        image = Image.open(image_path)
-    except Exception as e:
-        logger.error(f"Error opening image {image_path}: {e}")
-        return "Image Load Error"
-
-    try:
-        inputs = processor(images=image, return_tensors="pt")
-        with torch.no_grad():
-            outputs = model(**inputs)
-        
-        logits = outputs.logits
-        # Get top 5 predictions to check for disaster proxies
-        top5_prob, top5_indices = torch.topk(logits, 5)
-        
-        detected_disaster = None
-        top_label = model.config.id2label[top5_indices[0][0].item()]
+    def __init__(self):
+        self.processor = ViTImageProcessor.from_pretrained(IMAGENET_MODEL)
+        self.model = ViTForImageClassification.from_pretrained(IMAGENET_MODEL)
 
+    def _map_to_disaster(self, top5_indices):
+        """
+        Checks a row of top-5 ImageNet indices for disaster proxies.
+        """
         # Check top 5 for any disaster proxies
-        for i in range(5):
-            idx = top5_indices[0][i].item()
-            label = model.config.id2label[idx].lower()
-            
+        for idx in top5_indices:
+            label = self.model.config.id2label[idx].lower()
+
             for disaster, proxies in DISASTER_MAPPING.items():
                 for proxy in proxies:
                     if proxy in label:
                         # Found a potential disaster
-                        detected_disaster = disaster
                         logger.info(f"Disaster detected via proxy '{label}' -> {disaster}")
-                        break
-                if detected_disaster: break
-            if detected_disaster: break
-            
-        if detected_disaster:
-            return detected_disaster
-        
+                        return disaster
+
         return "Normal"
 
+    def classify(self, images):
+        """
+        Runs ViT on a list of PIL images in a single forward pass.
+        Returns one {"label", "scores"} dict per image.
+        """
+        inputs = self.processor(images=images, return_tensors="pt")
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+
+        logits = outputs.logits
+        # Get top 5 predictions to check for disaster proxies
+        top5_prob, top5_indices = torch.topk(logits, 5)
+
+        return [{"label": self._map_to_disaster(row), "scores": {}} for row in top5_indices.tolist()]
+
+
+def find_checkpoint(root=CHECKPOINT_ROOT):
+    """
+    Newest <root>/*/model directory that contains weights, or None.
+    """
+    for run_dir in sorted(glob.glob(os.path.join(root, '*')), reverse=True):
+        model_dir = os.path.join(run_dir, 'model')
+        if any(os.path.exists(os.path.join(model_dir, name)) for name in WEIGHT_FILES):
+            return model_dir
+    return None
+
+
+class FineTunedBackend:
+    """
+    Local fine-tuned ViT with direct disaster classes (earthquake / flood / wildfire).
+    There is no "Normal" class, so frames whose top probability is under the threshold
+    are reported as "Normal". Loads with local_files_only - never touches the network.
+    """
+    name = "finetuned"
+
+    def __init__(self, model_dir=None, threshold=DISASTER_THRESHOLD):
+        model_dir = model_dir or find_checkpoint()
+        if not model_dir or not any(os.path.exists(os.path.join(model_dir, name)) for name in WEIGHT_FILES):
+            raise FileNotFoundError(f"No fine-tuned checkpoint weights found (looked in {model_dir or CHECKPOINT_ROOT})")
+
+        # The MYKVASIRV2MODEL layout keeps the preprocessor next to the model directory
+        processor_dir = os.path.join(os.path.dirname(model_dir), 'feature_extractor')
+        if not os.path.exists(os.path.join(processor_dir, 'preprocessor_config.json')):
+            processor_dir = model_dir
+
+        self.processor = ViTImageProcessor.from_pretrained(processor_dir, local_files_only=True)
+        self.model = ViTForImageClassification.from_pretrained(model_dir, local_files_only=True)
+        self.model.eval()
+        self.threshold = threshold
+        # "earthquake" -> "Earthquake", matching the rest of the pipeline
+        self.labels = [self.model.config.id2label[i].capitalize() for i in range(self.model.config.num_labels)]
+        logger.info(f"Fine-tuned ViT loaded from {model_dir} (classes: {self.labels}, threshold: {threshold})")
+
+    def classify(self, images):
+        inputs = self.processor(images=images, return_tensors="pt")
+        with torch.no_grad():
+            probs = torch.softmax(self.model(**inputs).logits, dim=-1)
+
+        results = []
+        for row in probs.tolist():
+            scores = dict(zip(self.labels, row))
+            top_label = max(scores, key=scores.get)
+            label = top_label if scores[top_label] >= self.threshold else "Normal"
+            results.append({"label": label, "scores": scores})
+        return results
+
+
+def load_backend(name=CLASSIFIER_BACKEND):
+    if name == "finetuned":
+        try:
+            return FineTunedBackend(FINETUNED_MODEL_DIR)
+        except Exception as e:
+            logger.error(f"Failed to load fine-tuned ViT, falling back to ImageNet proxies: {e}")
+    return ImageNetProxyBackend()
+
+
+# Load model and processor globally to avoid reloading on every request
+try:
+    backend = load_backend()
+    logger.info(f"ViT model loaded successfully ({backend.name} backend).")
+except Exception as e:
+    logger.error(f"Failed to load ViT model: {e}")
+    backend = None
+
+def _classify_batch(images):
+    """
+    Classifies a list of PIL images with the active backend and returns one label per image.
+    """
+    try:
+        return [result["label"] for result in backend.classify(images)]
     except Exception as e:
         logger.error(f"Prediction error: {e}")
-        return "Prediction Error"
+        return ["Prediction Error"] * len(images)
+
+def _classify(image):
+    return _classify_batch([image])[0]
+
+def predict_path(image_path):
+    """
+    Predicts the class of an image using ViT and maps it to disaster categories.
+    """
+    if backend is None:
+        return "Model Load Error"
+
+    try:
+        image = Image.open(image_path)
+    except Exception as e:
+        logger.error(f"Error opening image {image_path}: {e}")
+        return "Image Load Error"
+
+    return _classify(image)
+
+def frame_to_pil(frame):
+    # OpenCV frames are BGR; the ViT processor expects RGB
+    if frame.ndim == 2:
+        return Image.fromarray(frame).convert("RGB")
+    return Image.fromarray(np.ascontiguousarray(frame[:, :, ::-1]))
+
+def predict_frame(frame):
+    """
+    Same as predict_path, but takes an already decoded BGR frame (e.g. from cv2.VideoCapture)
+    so callers don't have to write it to disk and read it back.
+    """
+    if backend is None:
+        return "Model Load Error"
+
+    if frame is None or frame.size == 0:
+        return "Image Load Error"
+
+    return _classify(frame_to_pil(frame))
+
+def predict_batch(frames):
+    """
+    Batched variant of predict_frame: classifies a list of BGR frames with one ViT forward pass.
+    Returns one label per frame, in order.
+    """
+    if backend is None:
+        return ["Model Load Error"] * len(frames)
+
+    if not frames:
+        return []
+
+    return _classify_batch([frame_to_pil(frame) for frame in frames])
 
-def predict_image(image_path):
-    # Wrapper to match expected signature
-    return predict_path(image_path)
+def predict_image(image):
+    # Wrapper to match expected signature. Accepts a file path or a decoded BGR frame.
+    if isinstance(image, np.ndarray):
+        return predict_frame(image)
+    return predict_path(image)
 
 if __name__ == "__main__":
     import sys
@@ -1,5 +1,6 @@
 import os
 import cv2
+import numpy as np
 from ultralytics import YOLO
 
 # Use standard YOLOv8n model (will download automatically)
@@ -14,14 +15,7 @@ def detect_people(frame):
     person_boxes = results[0].boxes.xyxy.cpu().numpy()
     return person_boxes
 
-def detect_person_count(image_path):
-    frame = cv2.imread(image_path)
-    if frame is None:
-        return 0
-    # frame = resize_image(frame, (650,400)) # Optional: resize for speed
-    
-    # Run inference
-    results = yolo_model(frame, verbose=False)[0]
+def _count_people(results):
     person_count = 0
 
     # Class ID for 'person' in COCO dataset is 0
@@ -36,6 +30,28 @@ def detect_person_count(image_path):
 
     return person_count
 
+def detect_person_count(image):
+    # Accepts a file path or an already decoded BGR frame (skips the imread round-trip)
+    frame = image if isinstance(image, np.ndarray) else cv2.imread(image)
+    if frame is None:
+        return 0
+    # frame = resize_image(frame, (650,400)) # Optional: resize for speed
+    
+    # Run inference
+    results = yolo_model(frame, verbose=False)[0]
+    return _count_people(results)
+
+def detect_person_counts(frames):
+    """
+    Batched variant of detect_person_count: runs YOLO once over a list of BGR frames.
+    Returns one person count per frame, in order.
+    """
+    if not frames:
+        return []
+
+    results = yolo_model(list(frames), verbose=False)
+    return [_count_people(r) for r in results]
+
 import sys
 
 if __name__ == "__main__":
@@ -1,36 +1,100 @@
 
 import sys
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Ensure New_Model is in path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), 'New_Model'))
 
 try:
-    from predict import predict_image
-    from predictyolo import detect_person_count
+    from predict import predict_image, predict_batch
+    from predictyolo import detect_person_count, detect_person_counts
 except ImportError as e:
     print(f"Agent Manager Import Error: {e}")
 
+import numpy as np
+
 from smart_analyst import analyst
+from result_cache import RESULT_CACHE_ENABLED, frame_cache, frame_phash
+
+# Concurrent Vision Agent: ViT and YOLO don't depend on each other, so each model gets its
+# own single-thread executor lane and both run on the same frame at the same time.
+VISION_CONCURRENT = os.getenv("VISION_CONCURRENT", "1") == "1"
+
+# Torch intra-op threads per lane. The two lanes split the cores between them so running
+# both models at once doesn't oversubscribe the CPU (with OpenMP builds - the default
+# Linux wheels - torch.set_num_threads applies to the calling thread).
+_cores = os.cpu_count() or 2
+VIT_THREADS = int(os.getenv("VIT_THREADS", str(max(1, _cores // 2))))
+YOLO_THREADS = int(os.getenv("YOLO_THREADS", str(max(1, _cores - VIT_THREADS))))
+
+def _set_torch_threads(num_threads):
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+    except Exception as e:
+        print(f"Could not set torch threads: {e}")
+
+_vit_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vision-vit",
+                                   initializer=_set_torch_threads, initargs=(VIT_THREADS,))
+_yolo_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vision-yolo",
+                                    initializer=_set_torch_threads, initargs=(YOLO_THREADS,))
+
+def _run_vision_models(classify, count, image):
+    """
+    Runs classify(image) and count(image), concurrently on the shared lanes unless
+    VISION_CONCURRENT=0, and returns (classification, people_count).
+    """
+    if not VISION_CONCURRENT:
+        return classify(image), count(image)
 
-def process_frame_with_agents(image_path, allow_fallback=True):
+    vit_future = _vit_executor.submit(classify, image)
+    yolo_future = _yolo_executor.submit(count, image)
+    return vit_future.result(), yolo_future.result()
+
+def is_cacheable(result):
+    # Don't cache results where Gemini failed - the next request should retry it
+    return not result.get("analyst_error") and not (result.get("analyst_report") or {}).get("error")
+
+def process_frame_with_agents(image, allow_fallback=True):
     """
     Orchestrates the Dual-Agent pipeline:
     1. Vision Agent (ViT + YOLO) -> Fast, cheap.
     2. Thinking Agent (Gemini) -> Slow, capable fallback.
+
+    image: a file path or a decoded BGR frame (np.ndarray). Frames stay in memory
+    end to end; they are only JPEG-encoded if they get sent to Gemini.
+    Results for decoded frames are cached by perceptual hash (see result_cache), so
+    near-identical frames return the previous result without running any model.
     """
+    frame_hash = None
+    if RESULT_CACHE_ENABLED and isinstance(image, np.ndarray):
+        frame_hash = frame_phash(image)
+        cached = frame_cache.get_similar(frame_hash, allow_fallback)
+        if cached is not None:
+            print("Result cache hit (frame)")
+            cached["cached"] = True
+            return cached
+
+    result = _process_frame(image, allow_fallback)
+    if frame_hash is not None and is_cacheable(result):
+        frame_cache.put((frame_hash, allow_fallback), result)
+    return result
+
+def _process_frame(image, allow_fallback):
     
     # --- STEP 1: VISION AGENT ---
     print("--- Vision Agent Active ---")
-    vision_label = predict_image(image_path)
-    vision_count = detect_person_count(image_path)
+    start = time.perf_counter()
+    vision_label, vision_count = _run_vision_models(predict_image, detect_person_count, image)
     
-    print(f"Vision Agent Result: Label={vision_label}, Count={vision_count}")
+    print(f"Vision Agent Result: Label={vision_label}, Count={vision_count} ({(time.perf_counter() - start) * 1000:.0f} ms)")
     
     # If Vision Agent finds a threat, trust it (it's tuned for high precision on proxies)
     if vision_label != "Normal":
         # Generate report for the detected threat
-        report = analyst.generate_report(image_path, vision_label, vision_count)
+        report = analyst.generate_report(image, vision_label, vision_count)
         return {
             "classification": vision_label,
             "people_count": vision_count,
@@ -50,12 +114,27 @@ def process_frame_with_agents(image_path, allow_fallback=True):
 
     # If Vision Agent says logical "Normal", we verify with Thinking Agent
     print("--- Thinking Agent Active (Fallback) ---")
-    thinking_result = analyst.analyze_scene(image_path)
+    thinking_result = analyst.analyze_scene(image)
     
     # Merge results
-    return {
+    result = {
         "classification": thinking_result["classification"],
         "people_count": thinking_result["people_count"],
         "analyst_report": thinking_result["analyst_report"],
         "source": "Thinking Agent"
     }
+    if thinking_result.get("error"):
+        result["analyst_error"] = thinking_result["error"]
+    return result
+
+def run_vision_agent_batch(frames):
+    """
+    Batched Vision Agent (ViT + YOLO only, no reports, no fallback).
+    Runs one ViT forward pass and one YOLO call over the whole list of BGR frames
+    and returns one {"classification", "people_count"} dict per frame, in order.
+    """
+    labels, counts = _run_vision_models(predict_batch, detect_person_counts, frames)
+    return [
+        {"classification": label, "people_count": count, "source": "Vision Agent"}
+        for label, count in zip(labels, counts)
+    ]
@@ -4,10 +4,14 @@ from flask_cors import CORS
 import os
 from dotenv import load_dotenv
 import sys
+import cv2
+import numpy as np
 
 # Load env vars
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
 from video_processor import process_video
+from job_queue import get_job_queue
+from result_cache import cache_stats
 
 # Database configuration
 from flask_migrate import Migrate
@@ -39,6 +43,9 @@ app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp', 'mp4', 'avi', 'mov'}
 
+# Background workers for /analyze_video?mode=job (see job_queue.JOB_BACKEND)
+job_queue = get_job_queue()
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -50,6 +57,36 @@ def classify_image():
 
 # We need to replace the endpoints below to add DB logging
 
+def log_video_result(results, filename, user_id=None):
+    summary = None
+    if results.get('analyst_report'):
+        summary = results['analyst_report'].get('summary')
+    
+    new_log = VideoLog(
+        user_id=user_id, # Link to user
+        filename=filename,
+        classification=results.get('classification', 'Unknown'),
+        people_count=results.get('people_count', 0),
+        report_summary=summary,
+        severity_score=results.get('analyst_report', {}).get('severity_score', 0) if results.get('analyst_report') else 0
+    )
+    db.session.add(new_log)
+    db.session.commit()
+
+def run_video_job(video_path, filename, user_id, sample_seconds=None, progress=None):
+    """
+    Job body for asynchronous video analysis: runs the pipeline, logs to the DB and
+    cleans up the uploaded temp file. Runs on a job queue worker, not in a request.
+    """
+    try:
+        results = process_video(video_path, sample_rate=30, sample_seconds=sample_seconds, progress=progress)
+        with app.app_context():
+            log_video_result(results, filename, user_id)
+        return results
+    finally:
+        if os.path.exists(video_path):
+            os.remove(video_path)
+
 @app.route('/analyze_video', methods=['POST'])
 def analyze_video():
     try:
@@ -86,26 +123,26 @@ def analyze_video():
             video.save(tmp.name)
             tmp_path = tmp.name
 
+        # Process video. Clients can ask for time based sampling (one frame every N seconds).
+        sample_seconds = request.form.get('sample_seconds', type=float)
+
+        # Job mode: return a job id right away and let a worker run the pipeline
+        if request.form.get('mode') == 'job' or request.args.get('mode') == 'job':
+            try:
+                job_id = job_queue.submit(run_video_job, tmp_path, video.filename, user_id, sample_seconds)
+            except Exception as e:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                print(f"Job submission error: {e}")
+                return jsonify({'error': 'Could not queue video for processing'}), 500
+            return jsonify({'job_id': job_id, 'status': 'queued', 'status_url': f"/jobs/{job_id}"}), 202
+
         try:
-            # Process video
-            results = process_video(tmp_path, sample_rate=30)
+            results = process_video(tmp_path, sample_rate=30, sample_seconds=sample_seconds)
             os.remove(tmp_path)
             
             # Log to Database
-            summary = None
-            if results.get('analyst_report'):
-                summary = results['analyst_report'].get('summary')
-            
-            new_log = VideoLog(
-                user_id=user_id, # Link to user
-                filename=video.filename,
-                classification=results.get('classification', 'Unknown'),
-                people_count=results.get('people_count', 0),
-                report_summary=summary,
-                severity_score=results.get('analyst_report', {}).get('severity_score', 0) if results.get('analyst_report') else 0
-            )
-            db.session.add(new_log)
-            db.session.commit()
+            log_video_result(results, video.filename, user_id)
 
             return jsonify(results)
         except Exception as e:
@@ -118,6 +155,24 @@ def analyze_video():
         print(f"Server error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    # Hit/miss counters for the video and frame result caches
+    return jsonify(cache_stats())
+
+@app.route('/analyst/stats', methods=['GET'])
+def get_analyst_stats():
+    # Gemini latency per image mode (inline bytes vs upload_file), for comparing the two paths
+    from smart_analyst import analyst
+    return jsonify(analyst.client.timing_stats() if analyst.client else {})
+
 @app.route('/analyze_frame', methods=['POST'])
 def analyze_frame():
     try:
@@ -128,20 +183,17 @@ def analyze_frame():
         if image.filename == '':
             return jsonify({'error': 'No selected file'}), 400
 
-        import tempfile
-        import shutil
         from agent_manager import process_frame_with_agents
 
-        suffix = "." + image.filename.rsplit('.', 1)[1].lower()
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            image.save(tmp.name)
-            tmp_path = tmp.name
+        # Decode the upload in memory - no temp file round-trip for live frames
+        buffer = np.frombuffer(image.read(), dtype=np.uint8)
+        frame = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        if frame is None:
+            return jsonify({'error': 'Could not decode image'}), 400
 
         try:
             # Delegate to Agent Manager
-            result = process_frame_with_agents(tmp_path)
-            
-            os.remove(tmp_path)
+            result = process_frame_with_agents(frame)
             
             # Optional: Log frames too? Might be too noisy. user asked for "videos captured or uploaded".
             # Live camera frames might be spammy. Let's log ONLY if a threat is detected?
@@ -163,8 +215,6 @@ def analyze_frame():
             return jsonify(result)
 
         except Exception as e:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
             print(f"Frame analysis error: {e}")
             return jsonify({'error': 'Frame analysis failed'}), 500
 
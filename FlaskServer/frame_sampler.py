@@ -0,0 +1,135 @@
+import os
+import time
+import cv2
+
+# How skipped frames are handled:
+# - "grab": cap.grab() every frame and only retrieve() the sampled ones, so skipped frames
+#           are never converted into BGR ndarrays.
+# - "seek": jump straight to the next sampled frame with CAP_PROP_POS_FRAMES. Cheaper than
+#           grabbing when the stride is longer than the keyframe interval.
+# - "auto": seek for long strides on files with a known frame count, grab otherwise.
+SAMPLER_MODE = os.getenv("SAMPLER_MODE", "auto")
+SEEK_MIN_STRIDE = int(os.getenv("SAMPLER_SEEK_MIN_STRIDE", "120"))
+
+SAMPLER_MODES = ("auto", "grab", "seek")
+
+
+class FrameSampler:
+    """
+    Iterates over the sampled frames of a video, yielding (frame_index, frame) tuples.
+
+    The stride is either frame based (sample_rate), time based (sample_seconds, using
+    CAP_PROP_FPS) or, if neither is given, picked so that ~target_frames are scanned.
+    Decode cost is tracked in self.stats and summarised by report().
+    """
+
+    def __init__(self, video_path, sample_rate=None, sample_seconds=None, mode=None, target_frames=20):
+        self.video_path = video_path
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise ValueError("Could not open video file")
+
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+
+        if sample_seconds:
+            # Time based: one frame every N seconds of video
+            if self.fps > 0:
+                sample_rate = max(1, int(round(self.fps * float(sample_seconds))))
+            else:
+                sample_rate = 30 # Fallback, FPS unknown
+        elif sample_rate is None:
+            if self.total_frames > 0:
+                sample_rate = max(30, self.total_frames // target_frames)
+            else:
+                sample_rate = 30 # Fallback
+        self.sample_rate = max(1, int(sample_rate))
+
+        mode = (mode or SAMPLER_MODE).lower()
+        if mode not in SAMPLER_MODES:
+            print(f"Unknown sampler mode '{mode}', using 'auto'")
+            mode = "auto"
+        if mode == "auto":
+            mode = "seek" if (self.total_frames > 0 and self.sample_rate >= SEEK_MIN_STRIDE) else "grab"
+        elif mode == "seek" and self.total_frames <= 0:
+            # Seeking needs to know where the video ends
+            mode = "grab"
+        self.mode = mode
+
+        self.stats = {
+            "frames_grabbed": 0,   # frames demuxed/decoded but not converted (grab mode)
+            "frames_decoded": 0,   # frames converted into BGR ndarrays
+            "seeks": 0,
+            "decode_seconds": 0.0, # time spent inside VideoCapture calls only
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def __iter__(self):
+        if self.mode == "seek":
+            return self._iter_seek()
+        return self._iter_grab()
+
+    def _iter_grab(self):
+        index = 0
+        while True:
+            start = time.perf_counter()
+            if index % self.sample_rate == 0:
+                ret, frame = self.cap.read()
+                if ret:
+                    self.stats["frames_decoded"] += 1
+            else:
+                ret, frame = self.cap.grab(), None
+                if ret:
+                    self.stats["frames_grabbed"] += 1
+            self.stats["decode_seconds"] += time.perf_counter() - start
+
+            if not ret:
+                break
+            if frame is not None:
+                yield index, frame
+            index += 1
+
+    def _iter_seek(self):
+        index = 0
+        while index < self.total_frames:
+            start = time.perf_counter()
+            if index > 0:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                self.stats["seeks"] += 1
+            ret, frame = self.cap.read()
+            if ret:
+                self.stats["frames_decoded"] += 1
+            self.stats["decode_seconds"] += time.perf_counter() - start
+
+            if not ret:
+                break
+            yield index, frame
+            index += self.sample_rate
+
+    def report(self):
+        """
+        Summary of what sampling cost, suitable for logging / returning in API responses.
+        """
+        decoded = self.stats["frames_decoded"]
+        seconds = self.stats["decode_seconds"]
+        return {
+            "mode": self.mode,
+            "sample_rate": self.sample_rate,
+            "total_frames": self.total_frames,
+            "fps": round(self.fps, 3),
+            "frames_sampled": decoded,
+            "frames_grabbed": self.stats["frames_grabbed"],
+            "seeks": self.stats["seeks"],
+            "decode_seconds": round(seconds, 4),
+            "ms_per_sampled_frame": round(1000 * seconds / decoded, 3) if decoded else None,
+        }
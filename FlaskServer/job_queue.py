@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import uuid
+import threading
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Which backend runs jobs:
+# - "inprocess": a thread pool inside the Flask worker (default, no extra services needed)
+# - "celery":    Celery workers with Redis as broker and job store
+#                (run them with: celery -A job_queue.celery_app worker)
+JOB_BACKEND = os.getenv("JOB_BACKEND", "inprocess")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Finished jobs are kept around this long so clients can still poll the result
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+def _new_job(job_id):
+    return {
+        "id": job_id,
+        "status": "queued",  # queued -> running -> done | failed
+        "progress": {"frames_scanned": 0, "total_frames": 0},
+        "result": None,
+        "error": None,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+    }
+
+
+class InMemoryJobStore:
+    """
+    Job state for the in-process backend. Only visible to the process that owns it.
+    """
+
+    def __init__(self, ttl=JOB_TTL_SECONDS):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id):
+        with self._lock:
+            self._evict_expired()
+            self._jobs[job_id] = _new_job(job_id)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _evict_expired(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished_at"] and job["finished_at"] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class RedisJobStore:
+    """
+    Job state shared between the Flask workers and Celery workers through Redis.
+    """
+
+    def __init__(self, url=REDIS_URL, ttl=JOB_TTL_SECONDS):
+        import redis
+        self.redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def _key(self, job_id):
+        return f"threatsense:job:{job_id}"
+
+    def create(self, job_id):
+        self.redis.set(self._key(job_id), json.dumps(_new_job(job_id)), ex=self.ttl)
+
+    def update(self, job_id, **fields):
+        job = self.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        self.redis.set(self._key(job_id), json.dumps(job), ex=self.ttl)
+
+    def get(self, job_id):
+        raw = self.redis.get(self._key(job_id))
+        return json.loads(raw) if raw else None
+
+
+def _run_job(store, job_id, target, args, kwargs):
+    """
+    Runs target(*args, progress=..., **kwargs) and records its outcome in the store.
+    """
+    store.update(job_id, status="running", started_at=time.time())
+
+    def progress(frames_scanned, total_frames):
+        store.update(job_id, progress={"frames_scanned": frames_scanned, "total_frames": total_frames})
+
+    try:
+        result = target(*args, progress=progress, **kwargs)
+        store.update(job_id, status="done", result=result, finished_at=time.time())
+    except Exception as e:
+        print(f"Job {job_id} failed: {e}")
+        store.update(job_id, status="failed", error=str(e), finished_at=time.time())
+
+
+class InProcessJobQueue:
+    """
+    Runs jobs on a thread pool in this process. Also what the tests use.
+    """
+
+    def __init__(self, store=None, max_workers=JOB_WORKERS):
+        self.store = store or InMemoryJobStore()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, target, *args, **kwargs):
+        """
+        Queues target(*args, **kwargs) and returns the job id immediately.
+        target must accept a progress(frames_scanned, total_frames) keyword argument.
+        """
+        job_id = str(uuid.uuid4())
+        self.store.create(job_id)
+        with self._lock:
+            self._pending += 1
+        self.executor.submit(self._run, job_id, target, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, target, args, kwargs):
+        try:
+            _run_job(self.store, job_id, target, args, kwargs)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def depth(self):
+        # Jobs queued or running
+        return self._pending
+
+
+def _target_name(target):
+    return f"{target.__module__}:{target.__qualname__}"
+
+
+def _resolve_target(name):
+    module_name, attr = name.split(":", 1)
+    return getattr(importlib.import_module(module_name), attr)
+
+
+celery_app = None
+if JOB_BACKEND == "celery":
+    try:
+        from celery import Celery
+        celery_app = Celery("threatsense", broker=REDIS_URL)
+
+        @celery_app.task(name="threatsense.run_job")
+        def run_celery_job(job_id, target, args, kwargs):
+            _run_job(RedisJobStore(), job_id, _resolve_target(target), args, kwargs)
+    except ImportError as e:
+        print(f"Celery backend unavailable: {e}")
+
+
+class CeleryJobQueue:
+    """
+    Hands jobs to Celery workers. Targets must be module-level functions and arguments
+    JSON-serialisable, since they travel through the broker. Files passed by path must be
+    on storage the Celery workers can see.
+    """
+
+    def __init__(self, store=None):
+        if celery_app is None:
+            raise RuntimeError("Celery backend requested but celery is not available")
+        self.store = store or RedisJobStore()
+
+    def submit(self, target, *args, **kwargs):
+        job_id = str(uuid.uuid4())
+        self.store.create(job_id)
+        celery_app.send_task("threatsense.run_job", args=[job_id, _target_name(target), list(args), kwargs])
+        return job_id
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def depth(self):
+        # Queue depth lives in the broker; not tracked here
+        return 0
+
+
+def get_job_queue():
+    """
+    Builds the job queue configured by JOB_BACKEND, falling back to in-process.
+    """
+    if JOB_BACKEND == "celery":
+        try:
+            return CeleryJobQueue()
+        except Exception as e:
+            print(f"Falling back to in-process job queue: {e}")
+    return InProcessJobQueue()
@@ -0,0 +1,146 @@
+import os
+import copy
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Result cache in front of process_video (keyed by a SHA-256 of the upload) and
+# process_frame_with_agents (keyed by a perceptual hash of the frame), so repeat
+# analyses skip ViT, YOLO and - most importantly - Gemini.
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE", "1") == "1"
+VIDEO_CACHE_SIZE = int(os.getenv("VIDEO_CACHE_SIZE", "128"))
+FRAME_CACHE_SIZE = int(os.getenv("FRAME_CACHE_SIZE", "512"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "3600"))
+# Max Hamming distance (out of 64 bits) for two frames to count as the same scene
+FRAME_HASH_MAX_DISTANCE = int(os.getenv("FRAME_HASH_MAX_DISTANCE", "4"))
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL and hit/miss counters.
+    Values are deep-copied on the way in and out so callers can't mutate cached results.
+    """
+
+    def __init__(self, max_entries, ttl=RESULT_CACHE_TTL):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _alive(self, key, now):
+        expires_at, _ = self._entries[key]
+        if self.ttl and expires_at < now:
+            del self._entries[key]
+            self.evictions += 1
+            return False
+        return True
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries and self._alive(key, time.time()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(self._entries[key][1])
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + (self.ttl or 0), copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class FrameResultCache(LRUCache):
+    """
+    LRU cache keyed by (perceptual hash, variant). Lookups also match entries whose hash
+    is within max_distance bits, so near-identical live frames share one result.
+    """
+
+    def __init__(self, max_entries, ttl=RESULT_CACHE_TTL, max_distance=FRAME_HASH_MAX_DISTANCE):
+        super().__init__(max_entries, ttl)
+        self.max_distance = max_distance
+
+    def get_similar(self, frame_hash, variant=None):
+        with self._lock:
+            now = time.time()
+            match = None
+            if (frame_hash, variant) in self._entries and self._alive((frame_hash, variant), now):
+                match = (frame_hash, variant)
+            elif self.max_distance > 0:
+                # Linear scan is fine at these sizes: one XOR + popcount per entry
+                best = self.max_distance + 1
+                for key in list(self._entries):
+                    other_hash, other_variant = key
+                    if other_variant != variant or not self._alive(key, now):
+                        continue
+                    distance = bin(frame_hash ^ other_hash).count("1")
+                    if distance < best:
+                        best, match = distance, key
+
+            if match is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(match)
+            self.hits += 1
+            return copy.deepcopy(self._entries[match][1])
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """
+    SHA-256 of a file's contents, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def frame_phash(frame):
+    """
+    64-bit DCT perceptual hash of a BGR (or grayscale) frame. Robust to re-encoding,
+    small resizes and sensor noise, so consecutive frames of a static scene collide.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low_freq = cv2.dct(small)[:8, :8].flatten()
+    bits = low_freq > np.median(low_freq[1:])  # DC term excluded from the median
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+video_cache = LRUCache(VIDEO_CACHE_SIZE)
+frame_cache = FrameResultCache(FRAME_CACHE_SIZE)
+
+
+def cache_stats():
+    return {
+        "enabled": RESULT_CACHE_ENABLED,
+        "video": video_cache.stats(),
+        "frame": frame_cache.stats(),
+    }
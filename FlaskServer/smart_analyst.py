@@ -1,24 +1,277 @@
 import os
+import io
+import json
+import random
+import threading
+import cv2
+import numpy as np
 import google.generativeai as genai
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
 
+# Gemini client limits. Under burst load these keep us from piling up blocking calls.
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))   # in-flight calls
+GEMINI_RATE_PER_MINUTE = float(os.getenv("GEMINI_RATE_PER_MINUTE", "60")) # token bucket refill
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "5"))                        # token bucket size
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))            # on 429 / 5xx
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "20")) # per-call deadline, retries included
+GEMINI_BACKOFF_SECONDS = float(os.getenv("GEMINI_BACKOFF_SECONDS", "0.5"))
+
+# How frames reach Gemini:
+# - "inline": downscaled, re-encoded JPEG bytes sent as an image part of the request (default)
+# - "upload": genai.upload_file first, then reference the file (extra round-trip, file kept by the Files API)
+GEMINI_IMAGE_MODE = os.getenv("GEMINI_IMAGE_MODE", "inline")
+GEMINI_INLINE_MAX_SIDE = int(os.getenv("GEMINI_INLINE_MAX_SIDE", "768"))  # longest side in pixels
+GEMINI_INLINE_QUALITY = int(os.getenv("GEMINI_INLINE_QUALITY", "85"))     # JPEG quality 1-100
+
+def upload_image(image):
+    """
+    Uploads an image to Gemini. Accepts a file path or a decoded BGR frame;
+    frames are JPEG-encoded in memory here, only when Gemini actually needs them.
+    """
+    if isinstance(image, np.ndarray):
+        ok, buffer = cv2.imencode('.jpg', image)
+        if not ok:
+            raise ValueError("Could not encode frame as JPEG")
+        return genai.upload_file(io.BytesIO(buffer.tobytes()), mime_type="image/jpeg")
+    return genai.upload_file(image)
+
+def inline_image_part(image, max_side=GEMINI_INLINE_MAX_SIDE, quality=GEMINI_INLINE_QUALITY):
+    """
+    Builds an inline image part for generate_content from a file path or BGR frame:
+    downscaled so the longest side is at most max_side, then JPEG-encoded in memory.
+    """
+    frame = image if isinstance(image, np.ndarray) else cv2.imread(image)
+    if frame is None:
+        raise ValueError(f"Could not read image {image}")
+
+    height, width = frame.shape[:2]
+    scale = max_side / float(max(height, width))
+    if max_side > 0 and scale < 1:
+        frame = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Could not encode frame as JPEG")
+    return {"mime_type": "image/jpeg", "data": buffer.tobytes()}
+
+class TokenBucket:
+    """
+    Token bucket rate limiter: `capacity` calls can burst, then `rate` calls/second.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """
+        Takes one token, waiting for a refill if needed. Returns False if the
+        deadline (a clock() value) would pass first.
+        """
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+            if deadline is not None and now + wait > deadline:
+                return False
+            self.sleep(wait)
+
+
+class GeminiDeadlineExceeded(TimeoutError):
+    pass
+
+
+def _status_code(exc):
+    # google.api_core exceptions expose the HTTP status as .code; other clients use .status_code
+    code = getattr(exc, "code", None)
+    if callable(code):
+        code = None
+    code = code if code is not None else getattr(exc, "status_code", None)
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc):
+    """
+    429 (quota / rate limit) and 5xx are worth retrying, as are network-level timeouts.
+    """
+    code = _status_code(exc)
+    if code is not None:
+        return code == 429 or 500 <= code < 600
+    return isinstance(exc, (TimeoutError, ConnectionError))
+
+
+class GeminiClient:
+    """
+    Pooled Gemini client: bounded concurrency, token-bucket rate limiting, exponential
+    backoff with jitter on 429/5xx, and a per-call deadline that covers queueing, uploads
+    and retries. `model` only needs a generate_content(parts, request_options=...) method,
+    so tests can pass a local fake.
+    """
+
+    def __init__(self, model, uploader=None, max_concurrency=GEMINI_MAX_CONCURRENCY,
+                 rate_per_minute=GEMINI_RATE_PER_MINUTE, burst=GEMINI_BURST,
+                 max_retries=GEMINI_MAX_RETRIES, timeout=GEMINI_TIMEOUT_SECONDS,
+                 backoff=GEMINI_BACKOFF_SECONDS, clock=time.monotonic, sleep=time.sleep,
+                 image_mode=GEMINI_IMAGE_MODE):
+        self.model = model
+        # uploader overrides image_mode (used by tests to skip encoding entirely)
+        self.uploader = uploader
+        self.image_mode = "custom" if uploader else image_mode
+        self.semaphore = threading.BoundedSemaphore(max(1, max_concurrency))
+        self.bucket = TokenBucket(rate_per_minute / 60.0, burst, clock=clock, sleep=sleep)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.clock = clock
+        self.sleep = sleep
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="gemini")
+
+        # Latency per image mode, so the inline and upload paths can be compared
+        self.timings = {}
+        self.timings_lock = threading.Lock()
+
+    def _image_part(self, image):
+        if self.uploader:
+            return self.uploader(image)
+        if self.image_mode == "upload":
+            return upload_image(image)
+        return inline_image_part(image)
+
+    def _record_timing(self, prepare_seconds, generate_seconds, images):
+        with self.timings_lock:
+            timing = self.timings.setdefault(self.image_mode, {"calls": 0, "images": 0, "prepare_seconds": 0.0, "generate_seconds": 0.0})
+            timing["calls"] += 1
+            timing["images"] += images
+            timing["prepare_seconds"] += prepare_seconds
+            timing["generate_seconds"] += generate_seconds
+        print(f"Gemini ({self.image_mode}): prepare {prepare_seconds * 1000:.0f} ms, generate {generate_seconds * 1000:.0f} ms")
+
+    def timing_stats(self):
+        """
+        Average prepare (encode or upload) and generate latency per image mode.
+        """
+        with self.timings_lock:
+            stats = {}
+            for mode, timing in self.timings.items():
+                calls = timing["calls"]
+                stats[mode] = {
+                    "calls": calls,
+                    "images": timing["images"],
+                    "avg_prepare_ms": round(1000 * timing["prepare_seconds"] / calls, 1),
+                    "avg_generate_ms": round(1000 * timing["generate_seconds"] / calls, 1),
+                    "avg_total_ms": round(1000 * (timing["prepare_seconds"] + timing["generate_seconds"]) / calls, 1),
+                }
+            return stats
+
+    def _remaining(self, deadline):
+        remaining = deadline - self.clock()
+        if remaining <= 0:
+            raise GeminiDeadlineExceeded("Gemini call deadline exceeded")
+        return remaining
+
+    def generate(self, images, prompt, timeout=None):
+        """
+        Sends the images (file paths or BGR frames) plus the prompt in ONE generate_content
+        call and returns the response text.
+        """
+        deadline = self.clock() + (timeout or self.timeout)
+        attempt = 0
+        while True:
+            if not self.bucket.acquire(deadline):
+                raise GeminiDeadlineExceeded("Gemini rate limit: no capacity before deadline")
+            if not self.semaphore.acquire(timeout=self._remaining(deadline)):
+                raise GeminiDeadlineExceeded("Gemini concurrency limit: no slot before deadline")
+            try:
+                start = time.perf_counter()
+                parts = [self._image_part(image) for image in images] + [prompt]
+                prepared = time.perf_counter()
+                result = self.model.generate_content(parts, request_options={"timeout": self._remaining(deadline)})
+                self._record_timing(prepared - start, time.perf_counter() - prepared, len(images))
+                return result.text
+            except GeminiDeadlineExceeded:
+                raise
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                # Exponential backoff with full jitter, never past the deadline
+                delay = random.uniform(0, self.backoff * (2 ** attempt))
+                if self.clock() + delay >= deadline:
+                    raise
+                print(f"Gemini call failed ({e}), retrying in {delay:.2f}s")
+                attempt += 1
+            finally:
+                self.semaphore.release()
+            self.sleep(delay)
+
+    def submit(self, images, prompt, timeout=None):
+        """
+        Non-blocking variant of generate(); returns a concurrent.futures.Future.
+        """
+        return self.executor.submit(self.generate, images, prompt, timeout)
+
+
+def _parse_json(response_text):
+    # Clean up cleanup response to ensure JSON
+    # Sometimes models add markdown code blocks
+    return json.loads(response_text.replace("```json", "").replace("```", "").strip())
+
+
+def _normalize_scene(data):
+    # Normalize keys just in case
+    cls = data.get("classification", "Normal")
+    if cls not in ["Wildfire", "Earthquake", "Flood", "Normal"]:
+        cls = "Normal"
+    
+    # Construct standard report structure if disaster detected
+    report = None
+    if cls != "Normal":
+        report = {
+            "summary": data.get("summary", "Disaster detected by Thinking Agent"),
+            "severity_score": data.get("severity_score", 5),
+            "actions": ["Verify camera feed", "Deploy response team"]
+        }
+    
+    return {
+        "classification": cls,
+        "people_count": data.get("people_count", 0),
+        "analyst_report": report
+    }
+
+
 class SmartAnalyst:
-    def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            print("WARNING: GOOGLE_API_KEY/GEMINI_API_KEY not found in environment variables.")
-            self.model = None
-        else:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-2.0-flash')
+    def __init__(self, model=None, uploader=None):
+        # model/uploader can be injected (e.g. a local fake Gemini in tests)
+        if model is None:
+            api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                print("WARNING: GOOGLE_API_KEY/GEMINI_API_KEY not found in environment variables.")
+            else:
+                genai.configure(api_key=api_key)
+                model = genai.GenerativeModel('gemini-2.0-flash')
+        self.model = model
+        self.client = GeminiClient(model, uploader=uploader) if model is not None else None
 
-    def generate_report(self, image_path, detected_label, person_count):
+    def generate_report(self, image, detected_label, person_count):
         """
-        Generates a security analyst report for a given frame.
+        Generates a security analyst report for a given frame (file path or BGR ndarray).
         """
         if not self.model:
             return {
@@ -52,33 +305,23 @@ class SmartAnalyst:
         """
 
         try:
-            # Upload the file to Gemini
-            myfile = genai.upload_file(image_path)
-            
-            # Generate content
-            result = self.model.generate_content([myfile, prompt])
-            
-            # extract text response
-            response_text = result.text
-            
-            # Clean up cleanup response to ensure JSON
-            # Sometimes models add markdown code blocks
-            response_text = response_text.replace("```json", "").replace("```", "").strip()
-            
-            import json
-            return json.loads(response_text)
+            # Upload the frame and generate content (rate limited, retried, with a deadline)
+            response_text = self.client.generate([image], prompt)
+            return _parse_json(response_text)
 
         except Exception as e:
             print(f"Smart Analyst Error: {e}")
             return {
                 "summary": f"Analysis failed: {str(e)}",
                 "severity_score": 0,
-                "actions": ["Manual review required"]
+                "actions": ["Manual review required"],
+                "error": str(e)
             }
 
-    def analyze_scene(self, image_path):
+    def analyze_scene(self, image):
         """
         Thinking Agent: Classifies scene and counts people when Vision Agent is uncertain.
+        Accepts a file path or a decoded BGR frame.
         """
         if not self.model:
              return {"classification": "Normal", "people_count": 0, "analyst_report": None}
@@ -103,36 +346,58 @@ class SmartAnalyst:
         """
         
         try:
-            myfile = genai.upload_file(image_path)
-            result = self.model.generate_content([myfile, prompt])
-            response_text = result.text.replace("```json", "").replace("```", "").strip()
-            
-            import json
-            data = json.loads(response_text)
-            
-            # Normalize keys just in case
-            cls = data.get("classification", "Normal")
-            if cls not in ["Wildfire", "Earthquake", "Flood", "Normal"]:
-                cls = "Normal"
-            
-            # Construct standard report structure if disaster detected
-            report = None
-            if cls != "Normal":
-                report = {
-                    "summary": data.get("summary", "Disaster detected by Thinking Agent"),
-                    "severity_score": data.get("severity_score", 5),
-                    "actions": ["Verify camera feed", "Deploy response team"]
-                }
-            
-            return {
-                "classification": cls,
-                "people_count": data.get("people_count", 0),
-                "analyst_report": report
-            }
+            response_text = self.client.generate([image], prompt)
+            return _normalize_scene(_parse_json(response_text))
+
+        except Exception as e:
+            print(f"Thinking Agent Error: {e}")
+            return {"classification": "Normal", "people_count": 0, "analyst_report": None, "error": str(e)}
+
+    def analyze_scenes(self, images):
+        """
+        Thinking Agent over several candidate frames in ONE generate_content call.
+        Returns one analyze_scene-style result per image, in order.
+        """
+        if not images:
+            return []
+        if len(images) == 1:
+            return [self.analyze_scene(images[0])]
+        if not self.model:
+            return [{"classification": "Normal", "people_count": 0, "analyst_report": None} for _ in images]
+
+        prompt = f"""
+        You are an advanced visual security agent.
+        You are given {len(images)} frames from the same surveillance video, in order.
+        Analyze EACH frame STRICTLY for the following disasters: 'Wildfire', 'Earthquake', 'Flood'.
+        
+        Task, for every frame:
+        1. Classify the frame into ONE of these categories: ['Wildfire', 'Earthquake', 'Flood', 'Normal'].
+           - Use 'Normal' if none of the specific disasters are clearly visible.
+        2. Count the number of visible people.
+        3. If a disaster is detected, provide a short 1-sentence summary and a severity score (1-10).
+        
+        Output format (JSON ONLY): a list with exactly {len(images)} objects, one per frame, in order:
+        [
+            {{
+                "classification": "Flood", 
+                "people_count": 2,
+                "summary": "...",
+                "severity_score": 8
+            }}
+        ]
+        """
+
+        try:
+            response_text = self.client.generate(images, prompt)
+            data = _parse_json(response_text)
+            if not isinstance(data, list) or len(data) != len(images):
+                raise ValueError(f"Expected {len(images)} results, got: {response_text[:200]}")
+            return [_normalize_scene(item) for item in data]
 
         except Exception as e:
             print(f"Thinking Agent Error: {e}")
-            return {"classification": "Normal", "people_count": 0, "analyst_report": None}
+            return [{"classification": "Normal", "people_count": 0, "analyst_report": None, "error": str(e)}
+                    for _ in images]
 
 # Singleton instance
 analyst = SmartAnalyst()
@@ -0,0 +1,187 @@
+import os
+import queue
+import threading
+
+# Inference workers consuming frame batches. One worker already overlaps decode with
+# inference; more only help if the cores aren't saturated by torch's own threads.
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "1"))
+# Max frame batches buffered between the decoder and the workers
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+
+def batched(frames, batch_size):
+    # Groups (frame_index, frame) tuples into lists of up to batch_size
+    batch = []
+    for item in frames:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class VisionPipeline:
+    """
+    Streaming Vision Agent scan over sampled video frames:
+
+        decode thread -> (bounded queue) -> inference workers -> result aggregator
+
+    The decode thread pulls (frame_index, frame) tuples from `frames` (e.g. a FrameSampler)
+    and groups them into batches. Workers run vision_fn(list_of_frames) -> list of
+    {"classification", "people_count"} dicts. The aggregator runs in the calling thread,
+    re-orders results by frame and applies the "first disaster wins / max people count"
+    logic; on the first disaster it cancels the decoder and workers.
+    """
+
+    def __init__(self, frames, vision_fn, batch_size=8, workers=None, queue_size=None,
+                 total_frames=0, progress=None, candidates=1):
+        self.frames = frames
+        self.vision_fn = vision_fn
+        self.batch_size = max(1, int(batch_size))
+        self.workers = max(1, int(workers or PIPELINE_WORKERS))
+        self.total_frames = total_frames
+        self.progress = progress
+        # How many frames, spread over the scan, to hand back for the Thinking Agent
+        self.candidates = max(1, int(candidates))
+        self._candidate_stride = 1
+        self._frames_seen = 0
+
+        self.cancel = threading.Event()
+        self.frame_queue = queue.Queue(maxsize=max(1, int(queue_size or PIPELINE_QUEUE_SIZE)))
+        self.result_queue = queue.Queue()
+
+    def _put(self, item):
+        # Blocking put that gives up once the pipeline is cancelled
+        while not self.cancel.is_set():
+            try:
+                self.frame_queue.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode(self):
+        try:
+            for seq, batch in enumerate(batched(self.frames, self.batch_size)):
+                if not self._put((seq, batch)):
+                    return
+        except Exception as e:
+            print(f"Decode error: {e}")
+        finally:
+            for _ in range(self.workers):
+                self._put(_DONE)
+
+    def _infer(self):
+        try:
+            while not self.cancel.is_set():
+                try:
+                    item = self.frame_queue.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    return
+
+                seq, batch = item
+                try:
+                    results = self.vision_fn([frame for _, frame in batch])
+                    self.result_queue.put((seq, batch, results, None))
+                except Exception as e:
+                    self.result_queue.put((seq, batch, None, e))
+        finally:
+            self.result_queue.put(_DONE)
+
+    def run(self):
+        """
+        Runs the scan to completion (or to the first disaster) and returns:
+        {"disaster": None or {"classification", "people_count", "frame", "frame_index"},
+         "max_people_count", "best_frame", "frames_scanned",
+         "candidate_frames": up to `candidates` frames spread over the scan, ending with best_frame}
+        """
+        threads = [threading.Thread(target=self._decode, name="pipeline-decode", daemon=True)]
+        threads += [threading.Thread(target=self._infer, name=f"pipeline-infer-{i}", daemon=True)
+                    for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        state = {"disaster": None, "max_people_count": 0, "best_frame": None, "frames_scanned": 0,
+                 "candidate_frames": []}
+        try:
+            self._aggregate(state)
+        finally:
+            self.cancel.set()
+            for thread in threads:
+                thread.join()
+
+        if state["best_frame"] is not None:
+            state["candidate_frames"] = state["candidate_frames"][:self.candidates - 1] + [state["best_frame"]]
+        return state
+
+    def _keep_candidate(self, state, frame):
+        # Keeps up to candidates - 1 earlier frames evenly spread over the scan: once the
+        # list is full every other frame is dropped and the keep-stride doubles.
+        if self.candidates > 1 and self._frames_seen % self._candidate_stride == 0:
+            kept = state["candidate_frames"]
+            kept.append(frame)
+            if len(kept) > self.candidates - 1:
+                kept[:] = kept[::2]
+                self._candidate_stride *= 2
+        self._frames_seen += 1
+
+    def _aggregate(self, state):
+        buffered = {}
+        next_seq = 0
+        workers_done = 0
+
+        while workers_done < self.workers:
+            item = self.result_queue.get()
+            if item is _DONE:
+                workers_done += 1
+                continue
+
+            seq, batch, results, error = item
+            buffered[seq] = (batch, results, error)
+
+            # Batches can finish out of order; consume them strictly in frame order
+            while next_seq in buffered:
+                batch, results, error = buffered.pop(next_seq)
+                next_seq += 1
+                if self._consume(state, batch, results, error):
+                    return
+
+    def _consume(self, state, batch, results, error):
+        # Returns True once a disaster has been found
+        if error is not None:
+            print(f"Error processing frames {batch[0][0]}-{batch[-1][0]}: {error}")
+            return False
+
+        for (index, frame), result in zip(batch, results):
+            label = result["classification"]
+            count = result["people_count"]
+
+            print(f"Frame {index} (Vision): {label}, Count: {count}")
+
+            state["frames_scanned"] += 1
+            if count > state["max_people_count"]:
+                state["max_people_count"] = count
+
+            # Keep this frame as a candidate for the Thinking Agent (if it's the last one we see)
+            # or if it's a disaster frame, we definitely want it
+            if state["best_frame"] is not None:
+                self._keep_candidate(state, state["best_frame"])
+            state["best_frame"] = frame
+
+            if label != "Normal":
+                # First disaster wins: stop decoding and inference upstream
+                state["disaster"] = {"classification": label, "people_count": count,
+                                     "frame": frame, "frame_index": index}
+                self.cancel.set()
+                break
+
+        if self.progress:
+            self.progress(index + 1, self.total_frames)
+
+        return state["disaster"] is not None
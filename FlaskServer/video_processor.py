@@ -2,7 +2,6 @@ import cv2
 import os
 import numpy as np
 from collections import Counter
-import tempfile
 
 # Import real prediction functions
 # We assume dependencies are installed now
@@ -15,109 +14,95 @@ try:
 except ImportError as e:
     print(f"Import Error in video_processor: {e}")
     # Fallback only if absolutely necessary, but we want to fail fast if models are missing now
-    def predict_image(image_path):
+    def predict_image(image):
         return "Model Import Error"
-    def detect_person_count(image_path):
+    def detect_person_count(image):
         return 0
 
-def process_video(video_path, sample_rate=None):
+from frame_sampler import FrameSampler
+from video_pipeline import VisionPipeline
+from result_cache import RESULT_CACHE_ENABLED, video_cache, file_digest
+
+# Number of sampled frames sent through the Vision Agent per forward pass
+DEFAULT_BATCH_SIZE = int(os.getenv("VISION_BATCH_SIZE", "8"))
+# Frames sent to the Thinking Agent (in one Gemini call) when the Vision Agent saw nothing
+GEMINI_FALLBACK_FRAMES = int(os.getenv("GEMINI_FALLBACK_FRAMES", "1"))
+
+def process_video(video_path, sample_rate=None, batch_size=None, sample_seconds=None, sampler_mode=None,
+                  progress=None, pipeline_workers=None):
     """
     Process video frames to detect threats and people.
     sample_rate: Optional. If None, dynamically calculated to process ~20 frames total.
+    batch_size: Optional. Sampled frames are collected into batches of this size and run
+                through ViT and YOLO together (defaults to VISION_BATCH_SIZE, 1 = frame by frame).
+    sample_seconds: Optional. Time based sampling, one frame every N seconds (overrides sample_rate).
+    sampler_mode: Optional. "grab", "seek" or "auto" (see frame_sampler.SAMPLER_MODE).
+    progress: Optional. Called as progress(frames_scanned, total_frames) after every batch.
+    pipeline_workers: Optional. Inference workers behind the decode thread (see video_pipeline).
     """
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise ValueError("Could not open video file")
-
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    
-    if sample_rate is None:
-        target_frames = 20
-        if total_frames > 0:
-            sample_rate = max(30, total_frames // target_frames)
-        else:
-            sample_rate = 30 # Fallback
+    if batch_size is None:
+        batch_size = DEFAULT_BATCH_SIZE
+    batch_size = max(1, int(batch_size))
+
+    # Same upload + same sampling = same answer; skip the whole pipeline (and Gemini)
+    cache_key = None
+    if RESULT_CACHE_ENABLED:
+        cache_key = (file_digest(video_path), sample_rate, sample_seconds)
+        cached = video_cache.get(cache_key)
+        if cached is not None:
+            print(f"Result cache hit (video): {video_path}")
+            cached["cached"] = True
+            return cached
+
+    sampler = FrameSampler(video_path, sample_rate=sample_rate, sample_seconds=sample_seconds, mode=sampler_mode)
             
     print(f"Processing video: {video_path}")
-    print(f"Total Frames: {total_frames}, Sample Rate: {sample_rate}")
-
-    frame_count = 0
-    predictions = []
-    max_people = 0
-    
-    import shutil
-    from agent_manager import process_frame_with_agents
-
-    # We will track the "most severe" result found
-    # Hierarchy: Disaster > Normal
-    # Temp file for the "best" frame (or last frame) to send to Gemini if needed
-    best_frame_path = os.path.join(tempfile.gettempdir(), 'threat_sense_best_frame.jpg')
-
-    # We will track the "max" people count found across all frames
-    max_people_count = 0
+    print(f"Total Frames: {sampler.total_frames}, Sample Rate: {sampler.sample_rate} ({sampler.mode}), Batch Size: {batch_size}")
+
+    from agent_manager import run_vision_agent_batch, is_cacheable
+    from smart_analyst import analyst
+
+    # FAST PATH: Vision Agent ONLY (No Fallback)
+    # Decode runs on its own thread and feeds batches to the inference workers; the scan
+    # stops as soon as the first disaster frame comes back.
+    with sampler:
+        scan = VisionPipeline(sampler, run_vision_agent_batch, batch_size=batch_size, workers=pipeline_workers,
+                              total_frames=sampler.total_frames, progress=progress,
+                              candidates=GEMINI_FALLBACK_FRAMES).run()
+
+    sampling = sampler.report()
+    print(f"Sampling: {sampling}")
+
+    # We track the "max" people count found across all scanned frames.
+    # The "best" frame (disaster frame, or last frame seen) stays a decoded ndarray -
+    # nothing is written to disk, it only gets JPEG-encoded if Gemini needs it.
+    max_people_count = scan["max_people_count"]
+    best_frame = scan["best_frame"]
     final_classification = "Normal"
     final_report = None
-    
-    # Priority: Flood/Wildfire/Earthquake > Normal
-    disaster_found = False
+    error = None
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        if frame_count % sample_rate == 0:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp:
-                cv2.imwrite(tmp.name, frame)
-                tmp_path = tmp.name
-
-            try:
-                # FAST PATH: Vision Agent ONLY (No Fallback)
-                # We want to scan the video quickly for obvious disasters
-                result = process_frame_with_agents(tmp_path, allow_fallback=False)
-                
-                label = result["classification"]
-                count = result["people_count"]
-                
-                print(f"Frame {frame_count} (Vision): {label}, Count: {count}")
-
-                if count > max_people_count:
-                    max_people_count = count
-
-                # Save this frame as a candidate for the Thinking Agent (if it's the last one we see)
-                # or if it's a disaster frame, we definitely want it
-                shutil.copy(tmp_path, best_frame_path)
-
-                if label != "Normal":
-                    # Vision Agent found a disaster!
-                    # Trust it and break early (or continue if we want to find 'worst' disaster? usually first detection is enough)
-                    # Let's verify this specific frame with the Analyst to get the report
-                    print(f"Vision Agent found {label}. Getting report...")
-                    # We can use the analyst directly or the manager to generate the report
-                    from smart_analyst import analyst
-                    report = analyst.generate_report(tmp_path, label, count)
-                    
-                    final_classification = label
-                    final_report = report
-                    disaster_found = True
-                    break # Stop processing, we found the threat
-
-            except Exception as e:
-                print(f"Error processing frame {frame_count}: {e}")
-            finally:
-                if os.path.exists(tmp_path):
-                    os.remove(tmp_path)
-
-        frame_count += 1
-
-    cap.release()
+    # Priority: Flood/Wildfire/Earthquake > Normal
+    disaster = scan["disaster"]
+    if disaster:
+        # Vision Agent found a disaster! Trust it and get the report for that frame
+        label = disaster["classification"]
+        print(f"Vision Agent found {label}. Getting report...")
+        final_classification = label
+        final_report = analyst.generate_report(disaster["frame"], label, disaster["people_count"])
     
     # SLOW PATH: If no disaster found by Vision Layer, use Thinking Agent ONCE
     # to verify the "Normal" status on the Best/Last Frame.
-    if not disaster_found and os.path.exists(best_frame_path):
-        print("Vision Agent saw Normal. Verifying with Thinking Agent (One-Shot)...")
-        from smart_analyst import analyst
-        thinking_result = analyst.analyze_scene(best_frame_path)
+    elif best_frame is not None:
+        candidates = scan["candidate_frames"]
+        print(f"Vision Agent saw Normal. Verifying with Thinking Agent (One-Shot, {len(candidates)} frame(s))...")
+        if len(candidates) > 1:
+            # Several frames, one generate_content call: first disaster wins, max people count
+            scene_results = analyst.analyze_scenes(candidates)
+            thinking_result = next((r for r in scene_results if r["classification"] != "Normal"), scene_results[-1])
+            thinking_result["people_count"] = max(r["people_count"] for r in scene_results)
+        else:
+            thinking_result = analyst.analyze_scene(best_frame)
         
         final_classification = thinking_result["classification"]
         # Update people count if Thinking agent sees more on this frame? 
@@ -126,14 +111,14 @@ def process_video(video_path, sample_rate=None):
             max_people_count = thinking_result["people_count"]
             
         final_report = thinking_result["analyst_report"]
-        
-        # Cleanup
-        os.remove(best_frame_path)
-    elif os.path.exists(best_frame_path):
-        os.remove(best_frame_path)
+        error = thinking_result.get("error")
 
-    return {
+    result = {
         "classification": final_classification,
         "people_count": max_people_count,
-        "analyst_report": final_report
+        "analyst_report": final_report,
+        "sampling": sampling
     }
+    if cache_key and not error and is_cacheable(result):
+        video_cache.put(cache_key, result)
+    return result
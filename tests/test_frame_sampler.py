@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+
+import cv2
+import numpy as np
+
+# Add FlaskServer to path to allow imports
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'FlaskServer'))
+
+from frame_sampler import FrameSampler
+
+def create_counter_video(filename, frames=300, fps=30):
+    """Creates a video whose frame i has brightness (i % 50) * 5, so sampled frames can be identified."""
+    height, width = 48, 64
+    out = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    for i in range(frames):
+        out.write(np.full((height, width, 3), (i % 50) * 5, dtype=np.uint8))
+    out.release()
+
+def _sample(path, **kwargs):
+    with FrameSampler(path, **kwargs) as sampler:
+        frames = [(index, int(frame.mean())) for index, frame in sampler]
+    return frames, sampler
+
+def test_grab_and_seek_agree():
+    print("Testing grab vs seek sampling...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "counter.avi")
+        create_counter_video(path)
+
+        grabbed, grab_sampler = _sample(path, sample_rate=30, mode="grab")
+        seeked, seek_sampler = _sample(path, sample_rate=30, mode="seek")
+
+    assert [i for i, _ in grabbed] == list(range(0, 300, 30)), grabbed
+    assert [i for i, _ in seeked] == [i for i, _ in grabbed], seeked
+    for (index, value), (_, seek_value) in zip(grabbed, seeked):
+        assert abs(value - (index % 50) * 5) <= 3, (index, value)
+        assert abs(seek_value - value) <= 3, (index, seek_value, value)
+
+    # Skipped frames are grabbed, never converted
+    report = grab_sampler.report()
+    assert report["frames_sampled"] == 10 and report["frames_grabbed"] == 290, report
+    assert seek_sampler.report()["seeks"] == 9
+    print("PASS")
+
+def test_time_based_sampling():
+    print("Testing time based sampling...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "counter.avi")
+        create_counter_video(path, frames=300, fps=30)
+        frames, sampler = _sample(path, sample_seconds=2, mode="grab")
+
+    assert sampler.sample_rate == 60
+    assert [i for i, _ in frames] == [0, 60, 120, 180, 240], frames
+    print("PASS")
+
+if __name__ == "__main__":
+    test_grab_and_seek_agree()
+    test_time_based_sampling()
+    print("\nAll tests passed!")
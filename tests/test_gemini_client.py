@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import time
+import threading
+
+import cv2
+import numpy as np
+
+# Add FlaskServer to path to allow imports
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'FlaskServer'))
+
+from smart_analyst import GeminiClient, GeminiDeadlineExceeded, SmartAnalyst, TokenBucket
+
+class FakeApiError(Exception):
+    """Looks like a google.api_core error: HTTP status in .code"""
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeGemini:
+    """Local stand-in for genai.GenerativeModel. Pops one scripted outcome per call."""
+    def __init__(self, outcomes=None, latency=0.0, default='{"summary": "ok", "severity_score": 3, "actions": []}'):
+        self.outcomes = list(outcomes or [])
+        self.latency = latency
+        self.default = default
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def generate_content(self, parts, request_options=None):
+        with self.lock:
+            self.calls.append((parts, request_options))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            outcome = self.outcomes.pop(0) if self.outcomes else self.default
+        try:
+            time.sleep(self.latency)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return FakeResponse(outcome)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+def _client(model, **kwargs):
+    kwargs.setdefault("sleep", lambda seconds: None)
+    kwargs.setdefault("rate_per_minute", 6000)
+    kwargs.setdefault("burst", 100)
+    return GeminiClient(model, uploader=lambda image: f"uploaded:{image}", **kwargs)
+
+def test_retries_429_and_5xx_then_succeeds():
+    print("Testing retry/backoff...")
+    model = FakeGemini([FakeApiError(429), FakeApiError(503), "done"])
+    assert _client(model, max_retries=3).generate(["frame"], "prompt") == "done"
+    assert len(model.calls) == 3
+    parts, request_options = model.calls[0]
+    assert parts == ["uploaded:frame", "prompt"]
+    assert request_options["timeout"] > 0
+    print("PASS")
+
+def test_does_not_retry_client_errors():
+    model = FakeGemini([FakeApiError(400), "never"])
+    try:
+        _client(model).generate(["frame"], "prompt")
+        raise AssertionError("expected FakeApiError")
+    except FakeApiError:
+        pass
+    assert len(model.calls) == 1
+
+def test_gives_up_after_max_retries():
+    model = FakeGemini([FakeApiError(500)] * 5)
+    try:
+        _client(model, max_retries=2).generate(["frame"], "prompt")
+        raise AssertionError("expected FakeApiError")
+    except FakeApiError:
+        pass
+    assert len(model.calls) == 3
+
+def test_concurrency_is_bounded_under_burst():
+    print("Testing concurrency limit...")
+    model = FakeGemini(latency=0.05)
+    client = _client(model, max_concurrency=2)
+    futures = [client.submit(["frame"], "prompt") for _ in range(8)]
+    assert all(f.result(timeout=5) for f in futures)
+    assert model.max_in_flight <= 2, model.max_in_flight
+    print("PASS")
+
+def test_rate_limit_respects_deadline():
+    print("Testing token bucket + deadline...")
+    now = [0.0]
+    bucket = TokenBucket(rate=1.0, capacity=2, clock=lambda: now[0], sleep=lambda s: now.__setitem__(0, now[0] + s))
+    assert bucket.acquire() and bucket.acquire()
+    assert bucket.acquire(deadline=0.5) is False  # next token only at t=1.0
+    assert bucket.acquire(deadline=2.0) is True and now[0] >= 1.0
+
+    model = FakeGemini()
+    client = _client(model, rate_per_minute=0.001, burst=1, timeout=0.2)
+    client.generate(["frame"], "prompt")
+    try:
+        client.generate(["frame"], "prompt")
+        raise AssertionError("expected deadline")
+    except GeminiDeadlineExceeded:
+        pass
+    assert len(model.calls) == 1
+    print("PASS")
+
+def test_multi_image_batch_is_one_call():
+    print("Testing multi-image batching...")
+    scenes = [
+        {"classification": "Normal", "people_count": 1},
+        {"classification": "Flood", "people_count": 4, "summary": "Street flooded", "severity_score": 7},
+        {"classification": "Lava", "people_count": 0},
+    ]
+    model = FakeGemini(["```json\n" + json.dumps(scenes) + "\n```"])
+    analyst = SmartAnalyst(model=model, uploader=lambda image: f"uploaded:{image}")
+    analyst.client.sleep = lambda seconds: None
+
+    results = analyst.analyze_scenes(["a", "b", "c"])
+    assert len(model.calls) == 1
+    assert model.calls[0][0][:3] == ["uploaded:a", "uploaded:b", "uploaded:c"]
+    assert [r["classification"] for r in results] == ["Normal", "Flood", "Normal"]
+    assert results[1]["analyst_report"]["severity_score"] == 7
+    print("PASS")
+
+def test_inline_mode_sends_downscaled_jpeg_bytes():
+    print("Testing inline image parts...")
+    model = FakeGemini(["ok"])
+    client = GeminiClient(model, image_mode="inline", sleep=lambda seconds: None)
+    frame = np.full((1080, 1920, 3), 128, dtype=np.uint8)
+    client.generate([frame], "prompt")
+
+    part = model.calls[0][0][0]
+    assert part["mime_type"] == "image/jpeg"
+    decoded = cv2.imdecode(np.frombuffer(part["data"], np.uint8), cv2.IMREAD_COLOR)
+    assert max(decoded.shape[:2]) <= 768, decoded.shape
+    assert client.timing_stats()["inline"]["calls"] == 1
+    print("PASS")
+
+if __name__ == "__main__":
+    test_retries_429_and_5xx_then_succeeds()
+    test_does_not_retry_client_errors()
+    test_gives_up_after_max_retries()
+    test_concurrency_is_bounded_under_burst()
+    test_rate_limit_respects_deadline()
+    test_multi_image_batch_is_one_call()
+    test_inline_mode_sends_downscaled_jpeg_bytes()
+    print("\nAll tests passed!")
@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+
+# Add FlaskServer to path to allow imports
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'FlaskServer'))
+
+from job_queue import InProcessJobQueue
+
+def fake_video_job(total_frames, progress=None):
+    for scanned in range(0, total_frames + 1, 10):
+        progress(scanned, total_frames)
+        time.sleep(0.01)
+    return {"classification": "Normal", "people_count": 3}
+
+def failing_job(progress=None):
+    raise ValueError("Could not open video file")
+
+def wait_for(queue, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish: {queue.get(job_id)}")
+
+def test_job_completes_with_progress():
+    print("Testing in-process job queue...")
+    queue = InProcessJobQueue(max_workers=2)
+    job_id = queue.submit(fake_video_job, 50)
+    assert queue.get(job_id)["status"] in ("queued", "running", "done")
+
+    job = wait_for(queue, job_id)
+    assert job["status"] == "done", job
+    assert job["result"] == {"classification": "Normal", "people_count": 3}
+    assert job["progress"] == {"frames_scanned": 50, "total_frames": 50}
+    assert queue.depth() == 0
+    print("PASS")
+
+def test_job_failure_is_reported():
+    print("Testing failed job...")
+    queue = InProcessJobQueue(max_workers=1)
+    job = wait_for(queue, queue.submit(failing_job))
+    assert job["status"] == "failed"
+    assert "Could not open video file" in job["error"]
+    print("PASS")
+
+def test_unknown_job():
+    assert InProcessJobQueue().get("does-not-exist") is None
+
+if __name__ == "__main__":
+    test_job_completes_with_progress()
+    test_job_failure_is_reported()
+    test_unknown_job()
+    print("\nAll tests passed!")
@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Add FlaskServer to path to allow imports
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'FlaskServer'))
+
+from result_cache import LRUCache, FrameResultCache, frame_phash
+
+def _scene(seed):
+    noise = np.random.RandomState(seed).randint(0, 255, (240, 320, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(noise, (31, 31), 0)
+
+def test_lru_eviction_and_ttl():
+    print("Testing LRU eviction and TTL...")
+    cache = LRUCache(max_entries=2, ttl=0.05)
+    cache.put("a", {"classification": "Normal"})
+    cache.put("b", {"classification": "Flood"})
+    assert cache.get("a") == {"classification": "Normal"}
+    cache.put("c", {"classification": "Wildfire"})  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    assert cache.get("c") == {"classification": "Wildfire"}
+
+    time.sleep(0.06)
+    assert cache.get("a") is None  # expired
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 2, stats
+    print("PASS")
+
+def test_cached_values_are_copies():
+    cache = LRUCache(max_entries=4)
+    cache.put("a", {"people_count": 1})
+    cache.get("a")["people_count"] = 99
+    assert cache.get("a") == {"people_count": 1}
+
+def test_near_identical_frames_share_a_result():
+    print("Testing perceptual hash lookups...")
+    frame = _scene(0)
+    noisy = np.clip(frame.astype(int) + np.random.RandomState(1).randint(-3, 4, frame.shape), 0, 255).astype(np.uint8)
+    ok, jpeg = cv2.imencode('.jpg', noisy, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    reencoded = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+
+    cache = FrameResultCache(max_entries=8, max_distance=4)
+    cache.put((frame_phash(frame), True), {"classification": "Flood"})
+
+    assert cache.get_similar(frame_phash(reencoded), True) == {"classification": "Flood"}
+    assert cache.get_similar(frame_phash(reencoded), False) is None  # different variant
+    assert cache.get_similar(frame_phash(_scene(42)), True) is None  # different scene
+    print("PASS")
+
+if __name__ == "__main__":
+    test_lru_eviction_and_ttl()
+    test_cached_values_are_copies()
+    test_near_identical_frames_share_a_result()
+    print("\nAll tests passed!")